@@ -19,6 +19,8 @@ from getpass import getpass
 import multiprocessing
 import datetime
 import requests
+import json
+import time
 
 #input username for both infoblox and switches and routers
 username = input("Username: ")
@@ -37,10 +39,16 @@ while(ptrue):
 #print the time. This is mostly for telling how long and when your script ran
 print(datetime.datetime.now())
 
+#every device gets one line in this file, so the result can be used by other automation
+results_file = "results.jsonl"
+
 #now to the star of the show. The function that runs for every device
 #this function is called with only the device ip or dns name. 
-#there is nothing to handle output from this so just handle it your self
+#it runs in another process, so instead of printing it returns a result that the main process writes
 def actionps(sw):
+    #start the clock and assume the best
+    started = time.time()
+    result = {'device': sw, 'stage': 'check', 'outcome': 'ok', 'facts': {}}
     #some things just fail so catch it
     try:
         #define the switch object. This will be used to connect to the device
@@ -59,10 +67,15 @@ def actionps(sw):
         rawout = connection.send_command("sh int status")
         #just as an example let's see if we have a 2/0/1 interface and output something if we do
         if ("2/0/1" in rawout):
-            print(sw + " have atleast 2 switches")
+            result['outcome'] = 'stack'
+            result['facts']['members'] = '2+'
     #as said eailer everything fails including your network and my code
     except Exception as e:
-        print(str(e))
+        result['outcome'] = 'error'
+        result['facts']['error'] = str(e)
+    result['duration'] = time.time() - started
+    result['timestamp'] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    return result
 
 #ask infoblox.example.com's dns server for everything in the sw.example.com internal view
 r = requests.get('https://infoblox.example.com/wapi/v2.1/record:a?_max_results=50000&zone=sw.example.com&view=Internal',auth=(username,password),verify=False)
@@ -82,7 +95,15 @@ for s in output:
 #start by defining a multithreading pool
 p = multiprocessing.Pool(128)
 #then map actionps and the swlist to it and watch the magic happen
-p.map(actionps, swlist)
+#imap_unordered hands back each result as soon as it is done, so nothing piles up in memory
+#and only this process touches the file and the screen, so lines never get mixed up
+with open(results_file, 'w') as f:
+    for result in p.imap_unordered(actionps, swlist, chunksize=16):
+        f.write(json.dumps(result) + "\n")
+        if result['outcome'] == 'stack':
+            print(result['device'] + " have atleast 2 switches")
+        elif result['outcome'] == 'error':
+            print(result['device'] + " " + result['facts']['error'])
 
 #when it's all done output the time again
 print(datetime.datetime.now())
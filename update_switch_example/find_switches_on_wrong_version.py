@@ -1,11 +1,17 @@
 #!/usr/bin/python3
 from getpass import getpass
 from threading import Thread
+from profiler import SamplingProfiler
+from results import DeviceResult, ResultSink
+import argparse
 import pusher
+import time
 
 username = None
 password = None
 switches = []
+wrong_version = []
+sink = ResultSink()
 
 
 def worker():
@@ -14,27 +20,74 @@ def worker():
     while len(switches) > 0:
         try:
             switch = switches.pop(0)
-            switch.createSSHConnection(username, password)
+        except IndexError:
+            return
+
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            if switch.createSSHConnection(username, password) == False:
+                outcome = "ssh_error"
+                continue
             switch.gatherFacts()
 
             if "WS-C2960C-12" in switch.platform:
                 if "SE10a" not in switch.software_version:
-                    print(switch.hostname)
-        except:
-            pass
+                    # Printed by the main thread, so the lines from 15 threads don't get mixed up
+                    wrong_version.append(switch.hostname)
+                    outcome = "wrong_version"
+        except Exception:
+            outcome = "error"
+        finally:
+            switch.disconnect()
+            sink.emit(
+                DeviceResult(
+                    device=switch.hostname,
+                    stage="discovery",
+                    outcome=outcome,
+                    duration=time.perf_counter() - started,
+                    facts=pusher.deviceFacts(switch),
+                )
+            )
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find switches on the wrong version")
+    parser.add_argument(
+        "--profile",
+        metavar="PREFIX",
+        help="Profile all worker threads and write PREFIX.collapsed and PREFIX.txt",
+    )
+    parser.add_argument(
+        "--results",
+        metavar="FILE",
+        help="Write a record per switch to FILE, .jsonl or .csv",
+    )
+    args = parser.parse_args()
+
     username = input("Username: ")
     password = getpass()
     switches = pusher.getDevices(username, password)
 
-    tl = []
+    profiler = None
+    if args.profile:
+        profiler = SamplingProfiler(tag_class=pusher.Switch)
+        profiler.start()
+
+    with ResultSink(args.results) as sink:
+        tl = []
+
+        for _ in range(0, 15):
+            t = Thread(target=worker)
+            t.start()
+            tl.append(t)
+
+        for t in tl:
+            t.join()
 
-    for _ in range(0, 15):
-        t = Thread(target=worker)
-        t.start()
-        tl.append(t)
+    for hostname in wrong_version:
+        print(hostname)
 
-    for t in tl:
-        t.join()
+    if profiler != None:
+        profiler.stop()
+        profiler.writeReport(args.profile)
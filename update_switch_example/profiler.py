@@ -0,0 +1,228 @@
+#!/usr/bin/python3
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    """Samples the stack of every running thread at a fixed interval
+        Used to find out where the time goes in a run, without any external tools
+    """
+
+    def __init__(self, interval: float = 0.015, tag_class: type = None):
+        """Initilize the profiler
+
+        Args:
+            interval (float, optional): Seconds between samples. Defaults to 0.015.
+            tag_class (type, optional): Class whose methods should get their own time table, e.g. Switch. Defaults to None.
+        """
+        if type(interval) not in (int, float) or interval <= 0:
+            raise ValueError("interval should be a positive number")
+
+        self.interval = interval
+        # Keyed on (thread name, code objects innermost first), turned into strings when reporting
+        self.stacks = Counter()
+        self.samples = 0
+        self.elapsed = 0.0
+        self.overhead = 0.0
+        self._thread_names = {}
+        self._tagged_codes = {}
+        self._thread = None
+        self._running = threading.Event()
+
+        if tag_class != None:
+            for name, attr in vars(tag_class).items():
+                if hasattr(attr, "__code__"):
+                    self._tagged_codes[attr.__code__] = f"{tag_class.__name__}.{name}"
+
+    def start(self) -> None:
+        """Starts sampling in a background thread"""
+        if self._thread != None:
+            raise RuntimeError("Profiler is already running")
+        self._running.set()
+        self._thread = threading.Thread(
+            target=self._sampler, name="profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops sampling and waits for the sampling thread to finish"""
+        if self._thread == None:
+            return
+        self._running.clear()
+        self._thread.join()
+        self._thread = None
+
+    def _sampler(self) -> None:
+        """Sampling loop, runs until stop is called
+
+        The sampler holds the GIL while it walks the stacks, so the work per sample is kept to
+        collecting code objects, everything else is done when the report is made
+        """
+        own_ident = threading.get_ident()
+        started = time.perf_counter()
+        thread_count = 0
+        while self._running.is_set():
+            sample_started = time.perf_counter()
+            frames = sys._current_frames()
+            # Idents are reused when a thread exits, so cached names are only trusted while no threads come or go
+            if len(frames) != thread_count:
+                self._thread_names = {}
+                thread_count = len(frames)
+            for ident, frame in frames.items():
+                if ident == own_ident:
+                    continue
+                self._record(ident, frame)
+            self.samples += 1
+            self.overhead += time.perf_counter() - sample_started
+            time.sleep(self.interval)
+        self.elapsed += time.perf_counter() - started
+
+    def _threadName(self, ident: int) -> str:
+        """Looks up the name of a thread, threading.enumerate is only called for threads not seen before
+
+        Args:
+            ident (int): Thread ident
+
+        Returns:
+            str: Thread name with numbers removed
+        """
+        if ident not in self._thread_names:
+            for t in threading.enumerate():
+                # Thread-12 (worker) and Thread-13 (worker) are the same code, so they are aggregated
+                self._thread_names[t.ident] = re.sub(r"-\d+", "", t.name)
+        return self._thread_names.get(ident, "unknown")
+
+    def _record(self, ident: int, frame) -> None:
+        """Adds a single thread stack to the collected samples
+
+        Args:
+            ident (int): Ident of the sampled thread
+            frame (frame): Innermost frame of the sampled thread
+        """
+        stack = []
+        while frame != None:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+        self.stacks[(self._threadName(ident), tuple(stack))] += 1
+
+    @staticmethod
+    def _label(code) -> str:
+        """Creates the display name for a function
+
+        Args:
+            code (code): Code object of the function
+
+        Returns:
+            str: Name, file and line of the function
+        """
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _labelledStacks(self) -> Counter:
+        """Turns the collected samples into stacks of strings, outermost frame first
+
+        Returns:
+            Counter: Sample count for each (thread name, function, function, ...) tuple
+        """
+        labels = {}
+        stacks = Counter()
+        for (thread_name, codes), count in self.stacks.items():
+            stack = [thread_name]
+            for code in reversed(codes):
+                if code not in labels:
+                    labels[code] = self._label(code)
+                stack.append(labels[code])
+            stacks[tuple(stack)] += count
+        return stacks
+
+    @property
+    def method_samples(self) -> Counter:
+        """Samples per method of tag_class, attributed to the innermost method in each stack"""
+        method_samples = Counter()
+        for (_, codes), count in self.stacks.items():
+            for code in codes:
+                if code in self._tagged_codes:
+                    method_samples[self._tagged_codes[code]] += count
+                    break
+        return method_samples
+
+    def collapsed(self) -> list:
+        """Returns the samples as collapsed stacks, the input format for flamegraph.pl and speedscope
+
+        Returns:
+            list: List of "frame;frame;frame count" strings
+        """
+        return [
+            ";".join(stack) + f" {count}"
+            for stack, count in self._labelledStacks().most_common()
+        ]
+
+    def topFunctions(self, n: int = 25) -> list:
+        """Finds the functions with most samples across all threads
+
+        Args:
+            n (int, optional): Number of functions to return. Defaults to 25.
+
+        Returns:
+            list: List of (function, self samples, total samples) tuples sorted by self samples
+        """
+        self_samples = Counter()
+        total_samples = Counter()
+        for stack, count in self._labelledStacks().items():
+            self_samples[stack[-1]] += count
+            for function in set(stack[1:]):
+                total_samples[function] += count
+        return [
+            (function, count, total_samples[function])
+            for function, count in self_samples.most_common(n)
+        ]
+
+    def report(self, n: int = 25) -> str:
+        """Creates a human readable report with the top functions and time per tagged method
+
+        Args:
+            n (int, optional): Number of functions in the top table. Defaults to 25.
+
+        Returns:
+            str: The report
+        """
+        # Sampling all threads takes time too, so the real period is longer than the interval
+        period = self.interval
+        if self.samples > 0 and self.elapsed > 0:
+            period = self.elapsed / self.samples
+
+        overhead_share = 0.0
+        if self.elapsed > 0:
+            overhead_share = self.overhead / self.elapsed * 100
+
+        lines = [
+            f"{self.samples} samples over {self.elapsed:.1f}s, one sample every {period:.4f}s",
+            f"Sampler held the GIL for {self.overhead:.2f}s ({overhead_share:.1f}% of the run), the other threads were slowed down by about that much",
+            "",
+            f"{'self':>10} {'total':>10}  function",
+        ]
+        for function, self_count, total_count in self.topFunctions(n):
+            lines.append(
+                f"{self_count * period:>9.2f}s {total_count * period:>9.2f}s  {function}"
+            )
+        method_samples = self.method_samples
+        if len(method_samples) > 0:
+            lines += ["", f"{'time':>10}  method"]
+            for method, count in method_samples.most_common():
+                lines.append(f"{count * period:>9.2f}s  {method}")
+        return "\n".join(lines) + "\n"
+
+    def writeReport(self, prefix: str, n: int = 25) -> None:
+        """Writes <prefix>.collapsed and <prefix>.txt
+
+        Args:
+            prefix (str): Path prefix for the report files
+            n (int, optional): Number of functions in the top table. Defaults to 25.
+        """
+        with open(f"{prefix}.collapsed", "w") as f:
+            f.write("\n".join(self.collapsed()) + "\n")
+        with open(f"{prefix}.txt", "w") as f:
+            f.write(self.report(n))
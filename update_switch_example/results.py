@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+import csv
+import datetime
+import json
+import queue
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+
+
+@dataclass
+class DeviceResult:
+    """Result of one stage for one device"""
+
+    device: str
+    stage: str
+    outcome: str
+    duration: float
+    facts: dict = field(default_factory=dict)
+    timestamp: str = field(
+        default_factory=lambda: datetime.datetime.now(datetime.timezone.utc).isoformat()
+    )
+
+
+class ResultSink:
+    """Streams DeviceResult records to a JSONL or CSV file
+        Workers only put records on a queue, a single writer thread owns the file
+    """
+
+    formats = ("jsonl", "csv")
+    flush_interval = 1.0
+    csv_fields = ["timestamp", "device", "stage", "outcome", "duration", "facts"]
+
+    def __init__(self, path: str = None, format: str = None):
+        """Opens the file and starts the writer thread
+
+        Args:
+            path (str, optional): File to write to, records are discarded if None. Defaults to None.
+            format (str, optional): jsonl or csv, taken from the file extension if None. Defaults to None.
+
+        Raises:
+            ValueError: Raised if the format isn't supported
+        """
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        if path == None:
+            return
+
+        if format == None:
+            format = path.rsplit(".", 1)[-1].lower()
+        if format not in self.formats:
+            raise ValueError(f"format should be one of {', '.join(self.formats)}")
+        self.format = format
+
+        self._file = open(path, "w", newline="", buffering=1024 * 1024)
+        if format == "csv":
+            self._csv = csv.DictWriter(self._file, fieldnames=self.csv_fields)
+            self._csv.writeheader()
+        self._thread = threading.Thread(
+            target=self._writer, name="result-writer", daemon=True
+        )
+        self._thread.start()
+
+    def __enter__(self) -> "ResultSink":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def emit(self, result: DeviceResult) -> None:
+        """Queues a record for writing, never blocks on the file
+
+        Args:
+            result (DeviceResult): The record
+        """
+        if type(result) is not DeviceResult:
+            raise TypeError("result should be a DeviceResult object")
+        if self._thread != None:
+            self._queue.put(result)
+
+    def close(self) -> None:
+        """Writes all queued records and closes the file"""
+        if self._thread == None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+
+    def _writer(self) -> None:
+        """Writer loop, runs until close puts None on the queue
+
+        Records are written in batches, the file is flushed when the queue is empty or at least every
+        flush_interval seconds, so the file can be followed while the run is going
+        """
+        last_flush = time.monotonic()
+        while True:
+            result = self._queue.get()
+            if result == None:
+                return
+            record = asdict(result)
+            if self.format == "csv":
+                record["facts"] = json.dumps(record["facts"], default=str)
+                self._csv.writerow(record)
+            else:
+                self._file.write(json.dumps(record, default=str) + "\n")
+
+            if (
+                self._queue.empty()
+                or time.monotonic() - last_flush > self.flush_interval
+            ):
+                self._file.flush()
+                last_flush = time.monotonic()
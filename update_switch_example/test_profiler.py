@@ -0,0 +1,76 @@
+import pytest
+import time
+from threading import Thread
+from profiler import SamplingProfiler
+
+
+class FakeSwitch:
+    def slowMethod(self):
+        time.sleep(0.2)
+
+
+class TestSamplingProfiler:
+    @pytest.fixture
+    def profiled_run(self):
+        p = SamplingProfiler(interval=0.001, tag_class=FakeSwitch)
+        p.start()
+        t = Thread(target=FakeSwitch().slowMethod, name="Thread-7 (worker)")
+        t.start()
+        t.join()
+        p.stop()
+        return p
+
+    def test_zero_interval(self):
+        with pytest.raises(ValueError):
+            SamplingProfiler(interval=0)
+
+    def test_string_as_interval(self):
+        with pytest.raises(ValueError):
+            SamplingProfiler(interval="fast")
+
+    def test_start_twice(self):
+        p = SamplingProfiler()
+        p.start()
+        with pytest.raises(RuntimeError):
+            p.start()
+        p.stop()
+
+    def test_stop_without_start(self):
+        SamplingProfiler().stop()
+
+    def test_samples_collected(self, profiled_run):
+        assert profiled_run.samples > 0
+        assert profiled_run.elapsed > 0
+
+    def test_thread_names_aggregated(self, profiled_run):
+        roots = {thread_name for thread_name, _ in profiled_run.stacks}
+        assert "Thread (worker)" in roots
+
+    def test_stacks_keyed_on_code(self, profiled_run):
+        for _, codes in profiled_run.stacks:
+            assert all(hasattr(code, "co_name") for code in codes)
+
+    def test_overhead(self, profiled_run):
+        assert 0 < profiled_run.overhead < profiled_run.elapsed
+        assert "Sampler held the GIL" in profiled_run.report()
+
+    def test_method_tagged(self, profiled_run):
+        assert profiled_run.method_samples["FakeSwitch.slowMethod"] > 0
+
+    def test_collapsed_format(self, profiled_run):
+        for line in profiled_run.collapsed():
+            stack, count = line.rsplit(" ", 1)
+            assert ";" in stack
+            assert int(count) > 0
+
+    def test_topFunctions(self, profiled_run):
+        top = profiled_run.topFunctions(5)
+        assert len(top) <= 5
+        for function, self_count, total_count in top:
+            assert total_count >= self_count
+
+    def test_writeReport(self, profiled_run, tmp_path):
+        prefix = str(tmp_path / "run")
+        profiled_run.writeReport(prefix)
+        assert "FakeSwitch.slowMethod" in open(f"{prefix}.txt").read()
+        assert "slowMethod" in open(f"{prefix}.collapsed").read()
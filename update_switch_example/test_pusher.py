@@ -1,6 +1,10 @@
+import json
+import os
 import pytest
 import pusher
+import time
 from mock import Mock
+from results import ResultSink
 
 
 class TestSoftwareVersion:
@@ -61,6 +65,80 @@ class TestSoftwareVersion:
         assert softwareversion.md5_sum == "1234"
 
 
+class TestSoftwareCatalog:
+    def make_sw(self, human_name, platform_pattern):
+        return pusher.SoftwareVersion(
+            human_name=human_name,
+            matching_pattern=human_name,
+            platform_pattern=platform_pattern,
+            boot_check="fake_boot",
+            FTP_path="ftp://test",
+            verification_path="flash:/test.bin",
+            md5_sum="12345",
+        )
+
+    @pytest.fixture
+    def catalog(self):
+        return pusher.SoftwareCatalog(
+            [
+                self.make_sw("generic 2960C", "WS-C2960C-"),
+                self.make_sw("2960C 8 port", "WS-C2960C-8"),
+                self.make_sw("2960CG", "WS-C2960CG-"),
+            ]
+        )
+
+    def test_string_in_list(self):
+        with pytest.raises(TypeError):
+            pusher.SoftwareCatalog(["16.06.04a"])
+
+    def test_duplicate_platform_pattern(self):
+        with pytest.raises(ValueError):
+            pusher.SoftwareCatalog(
+                [self.make_sw("a", "WS-C2960C-"), self.make_sw("b", "WS-C2960C-")]
+            )
+
+    def test_len(self, catalog):
+        assert len(catalog) == 3
+
+    def test_lookup_int_as_platform(self, catalog):
+        with pytest.raises(TypeError):
+            catalog.lookup(2960)
+
+    def test_lookup_most_specific(self, catalog):
+        assert catalog.lookup("WS-C2960C-8PC-L").human_name == "2960C 8 port"
+
+    def test_lookup_shorter_pattern(self, catalog):
+        assert catalog.lookup("WS-C2960C-12PC-L").human_name == "generic 2960C"
+
+    def test_lookup_overlapping_platform(self, catalog):
+        assert catalog.lookup("WS-C2960CG-8TC-L").human_name == "2960CG"
+
+    def test_lookup_unknown_platform(self, catalog):
+        assert catalog.lookup("C9300-48P") == None
+
+    def test_fromFile(self, tmp_path):
+        path = tmp_path / "catalog.json"
+        path.write_text(
+            '[{"human_name": "test", "matching_pattern": "16.06.04a", '
+            '"platform_pattern": "C9300-", "boot_check": "flash:/something.bin", '
+            '"FTP_path": "ftp://rwsar", "verification_path": "test", "md5_sum": "1234"}]'
+        )
+        catalog = pusher.SoftwareCatalog.fromFile(str(path))
+        assert catalog.lookup("C9300-48P").human_name == "test"
+
+    def test_fromFile_missing_field(self, tmp_path):
+        path = tmp_path / "catalog.json"
+        path.write_text('[{"human_name": "test"}]')
+        with pytest.raises(TypeError):
+            pusher.SoftwareCatalog.fromFile(str(path))
+
+    def test_shipped_catalog(self):
+        catalog = pusher.SoftwareCatalog.fromFile(
+            os.path.join(os.path.dirname(pusher.__file__), "software_targets.json")
+        )
+        assert catalog.lookup("WS-C2960C-12PC-L").human_name == "15.0(2)SE10a"
+
+
 class TestSwitch:
     @pytest.fixture
     def switch(self):
@@ -152,6 +230,18 @@ class TestSwitch:
         )
         assert switch_with_fake_data.isCompatibleWithSoftware(sw)
 
+    def test_isCompatibleWithSoftware_pattern_not_prefix(self, switch_with_fake_data):
+        sw = pusher.SoftwareVersion(
+            human_name="fake software",
+            matching_pattern="fake_pattern",
+            platform_pattern="hardware",
+            boot_check="fake_boot",
+            FTP_path="ftp://test",
+            verification_path="flash:/test.bin",
+            md5_sum="12345",
+        )
+        assert switch_with_fake_data.isCompatibleWithSoftware(sw) == False
+
     def test_updateSwitch_string_as_sw(self, switch_with_fake_data):
         with pytest.raises(TypeError):
             switch_with_fake_data.updateSwitch("this should not work")
@@ -252,8 +342,314 @@ class TestSwitch:
         )
         assert switch_with_fake_data.verifySoftware(sw)
 
+    def mock_send_command_staged(self, command, use_textfsm=False):
+        if command.startswith("dir "):
+            return (
+                "Directory of flash:/test/test.bin\n\n"
+                "  123  -rwx    14532608   Mar 1 1993 00:12:34 +00:00  test.bin\n"
+            )
+        if "verify /md5" in command:
+            return "verify /md5 (flash:/test/test.bin) = 12345\nVerified"
+        return ""
+
+    def mock_send_command_not_staged(self, command, use_textfsm=False):
+        if command.startswith("dir "):
+            return "%Error opening flash:/test/test.bin (No such file or directory)"
+        return ""
+
+    @pytest.fixture
+    def staged_sw(self):
+        return pusher.SoftwareVersion(
+            human_name="fake software",
+            matching_pattern="fake_pattern",
+            platform_pattern="fake_hardware",
+            boot_check="fake_boot",
+            FTP_path="ftp://test",
+            verification_path="flash:/test/test.bin",
+            md5_sum="12345",
+            image_size=14532608,
+        )
+
+    def test_image_size_default(self):
+        sw = pusher.SoftwareVersion(
+            human_name="test",
+            matching_pattern="16.06.04a",
+            platform_pattern="c9300",
+            boot_check="flash:/something.bin",
+            FTP_path="ftp://rwsar",
+            verification_path="test",
+            md5_sum="1234",
+        )
+        assert sw.image_size == None
+
+    def test_getStagedImageSize_string_as_sw(self, switch_with_fake_data):
+        with pytest.raises(TypeError):
+            switch_with_fake_data.getStagedImageSize("this should not work")
+
+    def test_getStagedImageSize(self, switch_with_fake_data, staged_sw):
+        switch_with_fake_data.conn.send_command = Mock(
+            side_effect=self.mock_send_command_staged
+        )
+        assert switch_with_fake_data.getStagedImageSize(staged_sw) == 14532608
+
+    def test_getStagedImageSize_missing(self, switch_with_fake_data, staged_sw):
+        switch_with_fake_data.conn.send_command = Mock(
+            side_effect=self.mock_send_command_not_staged
+        )
+        assert switch_with_fake_data.getStagedImageSize(staged_sw) == None
+
+    def test_isSoftwareStaged(self, switch_with_fake_data, staged_sw):
+        switch_with_fake_data.conn.send_command = Mock(
+            side_effect=self.mock_send_command_staged
+        )
+        assert switch_with_fake_data.isSoftwareStaged(staged_sw)
+
+    def test_isSoftwareStaged_wrong_size_skips_md5(
+        self, switch_with_fake_data, staged_sw
+    ):
+        switch_with_fake_data.conn.send_command = Mock(
+            side_effect=self.mock_send_command_staged
+        )
+        staged_sw.image_size = 1234
+        assert switch_with_fake_data.isSoftwareStaged(staged_sw) == False
+        for call in switch_with_fake_data.conn.send_command.call_args_list:
+            assert "verify /md5" not in call[0][0]
+
+    def test_updateSwitch_skips_download_when_staged(
+        self, switch_with_fake_data, staged_sw
+    ):
+        switch_with_fake_data.conn.send_command = Mock(
+            side_effect=self.mock_send_command_staged
+        )
+        switch_with_fake_data.updateSwitch(staged_sw)
+        for call in switch_with_fake_data.conn.send_command.call_args_list:
+            assert "archive download-sw" not in call[0][0]
+        switch_with_fake_data.conn.send_config_set.assert_called_with(
+            ["boot system flash:/test/test.bin"]
+        )
+
+    def test_updateSwitch_downloads_when_not_staged(
+        self, switch_with_fake_data, staged_sw
+    ):
+        switch_with_fake_data.conn.send_command = Mock(
+            side_effect=self.mock_send_command_not_staged
+        )
+        switch_with_fake_data.updateSwitch(staged_sw)
+        switch_with_fake_data.conn.send_command.assert_called_with(
+            "archive download-sw /imageonly /overwrite ftp://test"
+        )
+
+    def test_verifySoftware_is_cached(self, switch_with_fake_data, staged_sw):
+        switch_with_fake_data.conn.send_command = Mock(
+            side_effect=self.mock_send_command_staged
+        )
+        switch_with_fake_data.verifySoftware(staged_sw)
+        switch_with_fake_data.verifySoftware(staged_sw)
+        assert switch_with_fake_data.conn.send_command.call_count == 1
+
+
+class FakeSwitch(pusher.Switch):
+    def __init__(
+        self, hostname, platform, needs_upgrade, ssh_ok=True, fail=False, staged=False
+    ):
+        super().__init__(hostname, hostname + ".local")
+        self.fake_platform = platform
+        self.needs_upgrade = needs_upgrade
+        self.staged = staged
+        self.ssh_ok = ssh_ok
+        self.fail = fail
+        self.connections = 0
+        self.updated = False
+
+    def createSSHConnection(self, username, password):
+        self.connections += 1
+        if self.ssh_ok:
+            self.conn = Mock()
+        return self.ssh_ok
+
+    def gatherFacts(self):
+        if self.fail:
+            raise ValueError("textfsm parsing failed")
+        self.platform = self.fake_platform
+        self.software_version = "fake_old_ver" if self.needs_upgrade else "fake_ver"
+
+    def needsUpgrade(self, target_sw):
+        return self.needs_upgrade
+
+    def isSoftwareStaged(self, sw):
+        return self.staged
+
+    def updateSwitch(self, sw):
+        self.updated = True
+
+    def verifySoftware(self, target_sw):
+        return True
+
+
+class SlowDisconnectSwitch(FakeSwitch):
+    def disconnect(self):
+        # netmiko sends exit and tears down the transport, which takes a while
+        time.sleep(0.05)
+        super().disconnect()
+
+    def updateSwitch(self, sw):
+        time.sleep(0.1)
+        self.conn.send_command(
+            f"archive download-sw /imageonly /overwrite {sw.FTP_path}"
+        )
+        self.updated = True
+
+
+class SlowPushSwitch(FakeSwitch):
+    def updateSwitch(self, sw):
+        time.sleep(0.2)
+        self.updated = True
+
+
+class TestPipeline:
+    @pytest.fixture
+    def catalog(self):
+        return pusher.SoftwareCatalog(
+            [
+                pusher.SoftwareVersion(
+                    human_name="fake software",
+                    matching_pattern="fake_ver",
+                    platform_pattern="WS-C2960C-",
+                    boot_check="fake_boot",
+                    FTP_path="ftp://test",
+                    verification_path="flash:/test.bin",
+                    md5_sum="12345",
+                )
+            ]
+        )
+
+    @pytest.fixture
+    def devices(self):
+        return [
+            FakeSwitch("sw-upgrade-1", "WS-C2960C-8PC-L", True),
+            FakeSwitch("sw-upgrade-2", "WS-C2960C-12PC-L", True, staged=True),
+            FakeSwitch("sw-current", "WS-C2960C-8PC-L", False),
+            FakeSwitch("sw-unknown", "C9300-48P", True),
+            FakeSwitch("sw-no-ssh", "WS-C2960C-8PC-L", True, ssh_ok=False),
+            FakeSwitch("sw-broken", "WS-C2960C-8PC-L", True, fail=True),
+        ]
+
+    def test_disconnect(self):
+        switch = pusher.Switch("TEST_HOSTNAME", "hostname.local")
+        switch.conn = Mock()
+        conn = switch.conn
+        switch.disconnect()
+        conn.disconnect.assert_called_once()
+        assert switch.conn == None
+
+    def test_disconnect_without_conn(self):
+        pusher.Switch("TEST_HOSTNAME", "hostname.local").disconnect()
+
+    def test_no_discovery_threads(self, devices, catalog):
+        with pytest.raises(ValueError):
+            pusher.runPipeline(
+                devices, catalog, "test", "test", discovery_threads=0, dry_run=True
+            )
+
+    def test_no_push_threads(self, devices, catalog):
+        with pytest.raises(ValueError):
+            pusher.runPipeline(devices, catalog, "test", "test", push_threads=0)
 
-# TODO: Find some way to test worker function
+    def test_no_push_threads_dry_run(self, devices, catalog):
+        plan = pusher.runPipeline(
+            devices, catalog, "test", "test", push_threads=0, dry_run=True
+        )
+        assert len(plan) == 2
+
+    def test_dry_run(self, devices, catalog):
+        plan = pusher.runPipeline(
+            devices, catalog, "test", "test", discovery_threads=3, dry_run=True
+        )
+        assert sorted(p.switch.hostname for p in plan) == [
+            "sw-upgrade-1",
+            "sw-upgrade-2",
+        ]
+        assert not any(dev.updated for dev in devices)
+        staged = {p.switch.hostname: p.staged for p in plan}
+        assert staged == {"sw-upgrade-1": False, "sw-upgrade-2": True}
+
+    def test_push(self, devices, catalog):
+        plan = pusher.runPipeline(
+            devices,
+            catalog,
+            "test",
+            "test",
+            discovery_threads=3,
+            push_threads=2,
+            plan_queue_size=1,
+        )
+        assert len(plan) == 2
+        assert [dev.hostname for dev in devices if dev.updated] == [
+            "sw-upgrade-1",
+            "sw-upgrade-2",
+        ]
+        # Discovery and push use separate sessions
+        assert devices[0].connections == 2
+        assert devices[2].connections == 1
+
+    def test_push_after_slow_disconnect(self, catalog):
+        devices = [
+            SlowDisconnectSwitch(f"sw-upgrade-{i}", "WS-C2960C-8PC-L", True)
+            for i in range(0, 8)
+        ]
+        pusher.runPipeline(
+            devices, catalog, "test", "test", discovery_threads=4, push_threads=4
+        )
+        assert all(dev.updated for dev in devices)
+
+    def test_discovery_duration_excludes_backpressure(self, catalog, tmp_path):
+        devices = [
+            SlowPushSwitch(f"sw-upgrade-{i}", "WS-C2960C-8PC-L", True)
+            for i in range(0, 4)
+        ]
+        path = tmp_path / "results.jsonl"
+        with ResultSink(str(path)) as sink:
+            pusher.runPipeline(
+                devices,
+                catalog,
+                "test",
+                "test",
+                discovery_threads=4,
+                push_threads=1,
+                plan_queue_size=1,
+                sink=sink,
+            )
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        for r in records:
+            if r["stage"] == "discovery":
+                assert r["duration"] < 0.1
+
+    def test_connections_closed(self, devices, catalog):
+        pusher.runPipeline(devices, catalog, "test", "test", push_threads=1)
+        assert all(dev.conn == None for dev in devices)
+
+    def test_results(self, devices, catalog, tmp_path):
+        path = tmp_path / "results.jsonl"
+        with ResultSink(str(path)) as sink:
+            pusher.runPipeline(devices, catalog, "test", "test", sink=sink)
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        outcomes = {(r["device"], r["stage"]): r["outcome"] for r in records}
+        assert outcomes == {
+            ("sw-upgrade-1", "discovery"): "planned",
+            ("sw-upgrade-2", "discovery"): "planned",
+            ("sw-current", "discovery"): "up_to_date",
+            ("sw-unknown", "discovery"): "no_target",
+            ("sw-no-ssh", "discovery"): "ssh_error",
+            ("sw-broken", "discovery"): "error",
+            ("sw-upgrade-1", "push"): "ready_to_reload",
+            ("sw-upgrade-2", "push"): "ready_to_reload",
+        }
+        staged = {
+            r["device"]: r["facts"]["staged"]
+            for r in records
+            if r["stage"] == "discovery" and r["outcome"] == "planned"
+        }
+        assert staged == {"sw-upgrade-1": False, "sw-upgrade-2": True}
 
 
 class TestGetDevices:
@@ -0,0 +1,108 @@
+import csv
+import json
+import pytest
+import time
+from threading import Thread
+from results import DeviceResult, ResultSink
+
+
+class TestDeviceResult:
+    def test_missing_arguments(self):
+        with pytest.raises(TypeError):
+            DeviceResult(device="sw-test")
+
+    def test_defaults(self):
+        result = DeviceResult(
+            device="sw-test", stage="discovery", outcome="ok", duration=1.5
+        )
+        assert result.facts == {}
+        assert result.timestamp != None
+
+
+class TestResultSink:
+    @pytest.fixture
+    def result(self):
+        return DeviceResult(
+            device="sw-test",
+            stage="discovery",
+            outcome="planned",
+            duration=1.5,
+            facts={"platform": "WS-C2960C-8PC-L"},
+        )
+
+    def test_unknown_format(self, tmp_path):
+        with pytest.raises(ValueError):
+            ResultSink(str(tmp_path / "results.txt"))
+
+    def test_string_as_result(self, tmp_path):
+        with ResultSink(str(tmp_path / "results.jsonl")) as sink:
+            with pytest.raises(TypeError):
+                sink.emit("sw-test planned")
+
+    def test_no_path_discards(self, result):
+        sink = ResultSink()
+        sink.emit(result)
+        sink.close()
+
+    def test_close_twice(self, tmp_path):
+        sink = ResultSink(str(tmp_path / "results.jsonl"))
+        sink.close()
+        sink.close()
+
+    def test_jsonl(self, tmp_path, result):
+        path = tmp_path / "results.jsonl"
+        with ResultSink(str(path)) as sink:
+            sink.emit(result)
+        record = json.loads(path.read_text().splitlines()[0])
+        assert record["device"] == "sw-test"
+        assert record["outcome"] == "planned"
+        assert record["facts"]["platform"] == "WS-C2960C-8PC-L"
+
+    def test_csv(self, tmp_path, result):
+        path = tmp_path / "results.csv"
+        with ResultSink(str(path)) as sink:
+            sink.emit(result)
+        rows = list(csv.DictReader(open(path, newline="")))
+        assert rows[0]["device"] == "sw-test"
+        assert json.loads(rows[0]["facts"])["platform"] == "WS-C2960C-8PC-L"
+
+    def test_flushed_before_close(self, tmp_path, result):
+        path = tmp_path / "results.jsonl"
+        with ResultSink(str(path)) as sink:
+            for _ in range(0, 2000):
+                sink.emit(result)
+            for _ in range(0, 100):
+                if len(path.read_text().splitlines()) == 2000:
+                    break
+                time.sleep(0.01)
+            assert len(path.read_text().splitlines()) == 2000
+
+    def test_format_overrides_extension(self, tmp_path, result):
+        path = tmp_path / "results.out"
+        with ResultSink(str(path), format="csv") as sink:
+            sink.emit(result)
+        assert path.read_text().startswith("timestamp,device")
+
+    def test_many_threads(self, tmp_path):
+        path = tmp_path / "results.jsonl"
+
+        def emitter(sink, n):
+            for i in range(0, 500):
+                sink.emit(
+                    DeviceResult(
+                        device=f"sw-{n}-{i}",
+                        stage="discovery",
+                        outcome="ok",
+                        duration=0,
+                    )
+                )
+
+        with ResultSink(str(path)) as sink:
+            tl = [Thread(target=emitter, args=[sink, n]) for n in range(0, 8)]
+            for t in tl:
+                t.start()
+            for t in tl:
+                t.join()
+        lines = path.read_text().splitlines()
+        assert len(lines) == 4000
+        assert len({json.loads(line)["device"] for line in lines}) == 4000